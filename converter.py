@@ -10,6 +10,8 @@ from tqdm import tqdm
 import time
 from decimal import Decimal
 import zlib  # Built-in compression
+import base64
+import gzip
 
 # Optional compression libraries
 try:
@@ -32,23 +34,21 @@ def compress_data(data: str, method: str) -> str:
     # Convert string to bytes
     data_bytes = data.encode('utf-8')
     
-    # Add compression method prefix to compressed data
+    # Add compression method prefix to base64 encoded compressed data
     if method == 'zlib':
         compressed = zlib.compress(data_bytes)
-        return f"__compressed__zlib__{compressed.hex()}"
     elif method == 'zstandard':
         if not ZSTD_AVAILABLE:
             raise ImportError("zstandard package not installed. Install with: pip install zstandard")
         cctx = zstandard.ZstdCompressor()
         compressed = cctx.compress(data_bytes)
-        return f"__compressed__zstandard__{compressed.hex()}"
     elif method == 'lz4':
         if not LZ4_AVAILABLE:
             raise ImportError("lz4 package not installed. Install with: pip install lz4")
         compressed = lz4.frame.compress(data_bytes)
-        return f"__compressed__lz4__{compressed.hex()}"
     else:
         raise ValueError(f"Unknown compression method: {method}")
+    return f"__compressed__{method}__{base64.b64encode(compressed).decode('ascii')}"
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -57,6 +57,8 @@ class DecimalEncoder(json.JSONEncoder):
         return super(DecimalEncoder, self).default(obj)
 
 TOTAL_ENTRIES = 24400  # Total number of entries in the file
+COMMIT_INTERVAL = 2500  # Systems per transaction, committed batches survive a failed run
+READ_BUFFER_SIZE = 1 << 20  # Bytes handed to the JSON parser per read (ijson defaults to 64 KiB)
 
 MINERALS = {
     'Alexandrite', 'Bauxite', 'Benitoite', 'Bertrandite', 'Bromellite',
@@ -81,13 +83,19 @@ MINERAL_SIGNALS = MINERALS | METALS
 
 def calculate_distance(x: float, y: float, z: float, origin_x: float = 0, origin_y: float = 0, origin_z: float = 0) -> float:
     """Calculate distance between two points in 3D space."""
-    return math.sqrt((x - origin_x)**2 + (y - origin_y)**2 + (z - origin_z)**2)
+    return math.hypot(x - origin_x, y - origin_y, z - origin_z)
 
 def create_database(db_path: str):
     """Create the SQLite database schema."""
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
     
+    # The converter is the only user of the database while it runs
+    c.execute('PRAGMA locking_mode = EXCLUSIVE')
+    c.execute('PRAGMA cache_size = -524288')  # 512 MiB
+    c.execute('PRAGMA mmap_size = 268435456')
+    c.execute('PRAGMA temp_store = MEMORY')
+    
     # Main systems table with frequently searched fields
     c.execute('''CREATE TABLE IF NOT EXISTS systems (
         id64 INTEGER PRIMARY KEY,
@@ -139,18 +147,37 @@ def create_database(db_path: str):
         FOREIGN KEY(system_id64) REFERENCES systems(id64)
     )''')
     
-    # Create indices for common searches
+    # R*Tree index on system coordinates for distance range queries
+    try:
+        c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS systems_rtree USING rtree(
+            id64,
+            min_x, max_x,
+            min_y, max_y,
+            min_z, max_z
+        )''')
+    except sqlite3.OperationalError as e:
+        print(f"SQLite R*Tree module not available, skipping spatial index: {e}")
+    
+    conn.commit()
+    return conn
+
+def create_indexes(conn: sqlite3.Connection):
+    """Create indices for common searches.
+    
+    Called once the data is loaded, since building each index in one go is much
+    cheaper than updating it on every insert.
+    """
+    c = conn.cursor()
     c.execute('CREATE INDEX IF NOT EXISTS idx_controlling_power ON systems(controlling_power)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_coordinates ON systems(x, y, z)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_distance ON systems(distance_from_sol)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_mineral_type ON mineral_signals(mineral_type)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_mineral_system ON mineral_signals(system_id64)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_commodity_name ON station_commodities(commodity_name)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_commodity_search ON station_commodities(commodity_name, sell_price, demand)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_ring_search ON mineral_signals(ring_type, reserve_level)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_station_search ON stations(landing_pad_size, station_type)')
-    
     conn.commit()
-    return conn
 
 def extract_mineral_signals(body: Dict) -> list:
     """Extract mineral signals from a body's rings."""
@@ -203,9 +230,13 @@ def extract_station_commodities(station: Dict) -> list:
     return commodities
 
 def process_json_stream(json_file: str) -> Generator[Dict[Any, Any], None, None]:
-    """Stream the JSON file one system at a time to avoid memory issues."""
-    with open(json_file, 'rb') as file:
-        parser = ijson.items(file, 'item')
+    """Stream the JSON file one system at a time to avoid memory issues.
+    
+    Gzipped dumps (.gz) are decompressed on the fly, so they don't need extracting first.
+    """
+    opener = gzip.open if json_file.endswith('.gz') else open
+    with opener(json_file, 'rb') as file:
+        parser = ijson.items(file, 'item', buf_size=READ_BUFFER_SIZE, use_float=True)
         for system in parser:
             yield system
 
@@ -213,6 +244,7 @@ def convert_json_to_sqlite(json_file: str, db_file: str, max_distance: float, ex
     """Convert the large JSON file to SQLite database."""
     conn = create_database(db_file)
     c = conn.cursor()
+    has_rtree = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'systems_rtree'").fetchone() is not None
     
     try:
         processed = 0
@@ -248,9 +280,6 @@ def convert_json_to_sqlite(json_file: str, db_file: str, max_distance: float, ex
                 pbar.update(1)
                 continue
             
-            # Create a copy of the system data for all operations
-            system = json.loads(json.dumps(system, cls=DecimalEncoder))
-            
             # Process stations from both system level and bodies
             all_stations = []
             system_level_stations = []
@@ -292,14 +321,11 @@ def convert_json_to_sqlite(json_file: str, db_file: str, max_distance: float, ex
                         trimmed_outfitting += 1
             
             # Create stations table entries
+            station_rows = []
             for station, body_name in all_stations:
                 market_update_time = station['market'].get('updateTime')  # We know market exists due to filtering
                 
-                c.execute('''
-                    INSERT OR REPLACE INTO stations 
-                    (system_id64, station_id, body, station_name, station_type, primary_economy, landing_pad_size, distance_to_arrival, update_time)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
+                station_rows.append((
                     system['id64'],
                     station.get('id'),
                     body_name,
@@ -313,6 +339,11 @@ def convert_json_to_sqlite(json_file: str, db_file: str, max_distance: float, ex
                     float(station.get('distanceToArrival', 0)),
                     market_update_time
                 ))
+            c.executemany('''
+                INSERT OR REPLACE INTO stations 
+                (system_id64, station_id, body, station_name, station_type, primary_economy, landing_pad_size, distance_to_arrival, update_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', station_rows)
             
             # Compress the full_data JSON if compression is enabled
             # try:
@@ -353,42 +384,53 @@ def convert_json_to_sqlite(json_file: str, db_file: str, max_distance: float, ex
                 system_data['power_state']
             ))
             
+            # Systems are points, so each bounding box has zero size
+            if has_rtree:
+                c.execute('''
+                    INSERT OR REPLACE INTO systems_rtree 
+                    (id64, min_x, max_x, min_y, max_y, min_z, max_z)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (system_data['id64'], x, x, y, y, z, z))
+            
             # Process mineral signals from bodies
             if 'bodies' in system:
-                for body in system['bodies']:
-                    for signal in extract_mineral_signals(body):
-                        c.execute('''
-                            INSERT INTO mineral_signals 
-                            (system_id64, body_name, ring_name, mineral_type, signal_count, reserve_level, ring_type)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            system_data['id64'],
-                            signal['body_name'],
-                            signal['ring_name'],
-                            signal['mineral_type'],
-                            signal['signal_count'],
-                            signal['reserve_level'],
-                            signal['ring_type']
-                        ))
+                c.executemany('''
+                    INSERT INTO mineral_signals 
+                    (system_id64, body_name, ring_name, mineral_type, signal_count, reserve_level, ring_type)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (
+                        system_data['id64'],
+                        signal['body_name'],
+                        signal['ring_name'],
+                        signal['mineral_type'],
+                        signal['signal_count'],
+                        signal['reserve_level'],
+                        signal['ring_type']
+                    )
+                    for body in system['bodies']
+                    for signal in extract_mineral_signals(body)
+                ])
             
             # Process station commodities - filter out carriers
             if 'stations' in system:
-                for station in system['stations']:
+                c.executemany('''
+                    INSERT INTO station_commodities 
+                    (system_id64, station_name, commodity_name, sell_price, demand)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [
+                    (
+                        system_data['id64'],
+                        commodity['station_name'],
+                        commodity['commodity_name'],
+                        commodity['sell_price'],
+                        commodity['demand']
+                    )
+                    for station in system['stations']
                     # Skip carriers
-                    if station.get('type') == 'Drake-Class Carrier' or 'carrierName' in station:
-                        continue
-                    for commodity in extract_station_commodities(station):
-                        c.execute('''
-                            INSERT INTO station_commodities 
-                            (system_id64, station_name, commodity_name, sell_price, demand)
-                            VALUES (?, ?, ?, ?, ?)
-                        ''', (
-                            system_data['id64'],
-                            commodity['station_name'],
-                            commodity['commodity_name'],
-                            commodity['sell_price'],
-                            commodity['demand']
-                        ))
+                    if not (station.get('type') == 'Drake-Class Carrier' or 'carrierName' in station)
+                    for commodity in extract_station_commodities(station)
+                ])
             
             total_stations = system_stations + body_stations
             
@@ -410,13 +452,16 @@ def convert_json_to_sqlite(json_file: str, db_file: str, max_distance: float, ex
                 stats_bar.set_description_str(stats)
                 last_update = current_time
                 
-            if processed % 1000 == 0:
+            if processed % COMMIT_INTERVAL == 0:
                 conn.commit()
         
         conn.commit()
         pbar.close()
         stats_bar.close()
         
+        print("Creating indexes...")
+        create_indexes(conn)
+        
         # Final statistics
         total_time = time.time() - start_time
         print(f"\nConversion complete:")
@@ -435,12 +480,15 @@ def convert_json_to_sqlite(json_file: str, db_file: str, max_distance: float, ex
     except Exception as e:
         print(f"\nError during conversion: {e}")
         conn.rollback()
+        # Batches committed before the error are kept, so index them too
+        print("Creating indexes...")
+        create_indexes(conn)
     finally:
         conn.close()
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Convert Elite Dangerous JSON data to SQLite database')
-    parser.add_argument('json_file', help='Path to the input JSON file')
+    parser.add_argument('json_file', help='Path to the input JSON file (.json or .json.gz)')
     parser.add_argument('db_file', help='Path to the output SQLite database file')
     parser.add_argument('--max-distance', type=str, required=True,
                       help='Maximum distance from Sol in light years')
@@ -153,20 +153,17 @@ def get_price_comparison(current_price, reference_price):
     else:
         return '#af0019', '     ---'
 
+# Codes and full names both map to the full name, built once instead of per lookup
+COMMODITY_NAME_MAPPINGS = {
+    **MATERIAL_MAPPINGS,
+    **{v: v for v in MATERIAL_MAPPINGS.values()},
+    'LowTemperatureDiamond': 'Low Temperature Diamonds'
+}
+
 def normalize_commodity_name(name):
     """Normalize commodity names for price lookup."""
-    # Special case for LowTemperatureDiamond
-    if name == 'LowTemperatureDiamond':
-        return 'Low Temperature Diamonds'
-    
-    # Create reverse mapping (full name to full name)
-    full_names = {v: v for v in MATERIAL_MAPPINGS.values()}
-    
-    # Combine both mappings
-    all_mappings = {**MATERIAL_MAPPINGS, **full_names}
-    
     # Return the full name if found in mappings, otherwise return the original name
-    return all_mappings.get(name, name)
+    return COMMODITY_NAME_MAPPINGS.get(name, name)
 
 def get_material_codes():
     """Load and return mapping of material codes to full names."""
@@ -3,15 +3,14 @@ import sqlite3
 import json
 import zlib
 import base64
+import math
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-def dict_factory(cursor, row):
-    """Simple dict factory without decompression."""
-    return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
-
-def load_res_data(database_path) -> List[Dict]:
-    """Load RES hotspot data from CSV file."""
+@lru_cache(maxsize=1)
+def _load_res_rows() -> Tuple[Dict, ...]:
+    """Parse the RES hotspot CSV file once, shared between requests."""
     res_data = []
     with open('data/plat-hs-and-res-maps.csv', 'r') as f:
         reader = csv.DictReader(f)
@@ -23,12 +22,16 @@ def load_res_data(database_path) -> List[Dict]:
                 'res_zone': row['RES/Pt HS?'],
                 'comment': row['For edtools list']
             })
-    return res_data
+    return tuple(res_data)
+
+def load_res_data(database_path=None) -> Tuple[Dict, ...]:
+    """Load RES hotspot data from CSV file."""
+    return _load_res_rows()
 
 def get_system_info(conn: sqlite3.Connection, system_name: str) -> Optional[Dict]:
     """Get system information from database."""
     cursor = conn.cursor()
-    cursor.row_factory = dict_factory
+    cursor.row_factory = sqlite3.Row
     cursor.execute('''
         SELECT name, controlling_power, x, y, z
         FROM systems
@@ -36,14 +39,36 @@ def get_system_info(conn: sqlite3.Connection, system_name: str) -> Optional[Dict
     ''', (system_name,))
     return cursor.fetchone()
 
+def get_systems_info(conn: sqlite3.Connection, system_names: List[str]) -> Dict[str, Dict]:
+    """Get system information for several systems in one query, keyed by system name."""
+    if not system_names:
+        return {}
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    placeholders = ','.join('?' for _ in system_names)
+    cursor.execute(f'''
+        SELECT id64, name, controlling_power, x, y, z
+        FROM systems
+        WHERE name IN ({placeholders})
+    ''', list(system_names))
+    return {row['name']: row for row in cursor.fetchall()}
+
 def get_station_commodities(conn: sqlite3.Connection, system_id64: int) -> List[Dict]:
     """Get station commodity information for a system."""
+    return get_systems_station_commodities(conn, [system_id64]).get(system_id64, [])
+
+def get_systems_station_commodities(conn: sqlite3.Connection, system_ids: List[int]) -> Dict[int, List[Dict]]:
+    """Get station commodity information for several systems, keyed by system id64."""
+    if not system_ids:
+        return {}
     cursor = conn.cursor()
-    cursor.row_factory = dict_factory
+    cursor.row_factory = sqlite3.Row
     
-    # Get all commodities in a single query
-    cursor.execute('''
+    # Get all commodities for all systems in a single query
+    placeholders = ','.join('?' for _ in system_ids)
+    cursor.execute(f'''
         SELECT DISTINCT 
+            s.system_id64,
             s.station_name,
             s.landing_pad_size,
             s.distance_to_arrival,
@@ -59,33 +84,33 @@ def get_station_commodities(conn: sqlite3.Connection, system_id64: int) -> List[
         FROM stations s
         JOIN station_commodities sc ON s.system_id64 = sc.system_id64 
             AND s.station_name = sc.station_name
-        WHERE s.system_id64 = ?
+        WHERE s.system_id64 IN ({placeholders})
         AND sc.sell_price > 0 AND sc.demand > 0
-        ORDER BY s.station_name, priority, sc.sell_price DESC
-    ''', (system_id64,))
+        ORDER BY s.system_id64, s.station_name, priority, sc.sell_price DESC
+    ''', list(system_ids))
     
+    systems = {}
     stations = {}
-    current_station = None
     other_count = 0
     
     for row in cursor.fetchall():
-        station_name = row['station_name']
+        station_key = (row['system_id64'], row['station_name'])
         
-        if station_name not in stations:
-            stations[station_name] = {
-                'name': station_name,
+        if station_key not in stations:
+            stations[station_key] = {
+                'name': row['station_name'],
                 'pad_size': row['landing_pad_size'],
                 'distance': row['distance_to_arrival'],
                 'station_type': row['station_type'],
                 'update_time': row['update_time'],
                 'other_commodities': []
             }
-            current_station = station_name
+            systems.setdefault(row['system_id64'], []).append(stations[station_key])
             other_count = 0
             
         # Add commodity if it's a priority commodity or if we haven't hit the limit for other commodities
         if row['priority'] == 1 or other_count < 3:
-            stations[station_name]['other_commodities'].append({
+            stations[station_key]['other_commodities'].append({
                 'name': row['commodity_name'],
                 'sell_price': row['sell_price'],
                 'demand': row['demand']
@@ -93,14 +118,15 @@ def get_station_commodities(conn: sqlite3.Connection, system_id64: int) -> List[
             if row['priority'] == 2:
                 other_count += 1
     
-    return list(stations.values())
+    return systems
 
 def calculate_distance(x1: float, y1: float, z1: float, x2: float, y2: float, z2: float) -> float:
     """Calculate distance between two points in 3D space."""
-    return ((x2-x1)**2 + (y2-y1)**2 + (z2-z1)**2) ** 0.5 
+    return math.hypot(x2-x1, y2-y1, z2-z1)
 
-def load_high_yield_platinum():
-    """Load high yield platinum hotspot data from CSV file."""
+@lru_cache(maxsize=1)
+def load_high_yield_platinum() -> Tuple[Dict, ...]:
+    """Load high yield platinum hotspot data from CSV file, parsed once and shared between requests."""
     data = []
     csv_path = Path(__file__).parent / 'data' / 'plat-high-yield-hotspots.csv'
     
@@ -117,4 +143,4 @@ def load_high_yield_platinum():
     
     # Sort by distance
     data.sort(key=lambda x: float(x['dst']))
-    return data 
\ No newline at end of file
+    return tuple(data) 
\ No newline at end of file
@@ -1,10 +1,14 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, g, render_template, request, jsonify, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 import sqlite3
 from typing import Dict, List, Optional
 import math
 import os
 import json
+import threading
+import argparse
 import zlib  # Built-in compression
+import base64
 import mining_data
 from mining_data import (
     get_material_ring_types, 
@@ -32,6 +36,20 @@ try:
 except ImportError:
     LZ4_AVAILABLE = False
 
+# Optional faster JSON encoding
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional multi-threaded WSGI server
+try:
+    import waitress
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
 # Get the absolute path of the directory containing server.py
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -39,37 +57,67 @@ app = Flask(__name__,
            template_folder=BASE_DIR,  # Set template folder to the root directory
            static_folder=None)  # Disable default static folder handling
 
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider that encodes with orjson, keeping Flask's key sorting and debug indentation."""
+    
+    def _options(self) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return option
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response instead of round-tripping through str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self._options() | orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype
+        )
+
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
+
+# Let browsers cache static files instead of re-requesting them on every page load.
+# send_from_directory already adds an ETag, so expired files are revalidated with a 304.
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 3600
+
 # Routes for static files
 @app.route('/favicon.ico')
 def favicon():
     return send_from_directory(os.path.join(app.root_path),
                              'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
+# Correct MIME types for different file extensions
+STATIC_MIME_TYPES = {
+    '.js': 'application/javascript',
+    '.css': 'text/css',
+    '.html': 'text/html',
+    '.ico': 'image/x-icon',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.woff': 'font/woff',
+    '.woff2': 'font/woff2',
+    '.ttf': 'font/ttf'
+}
+
 @app.route('/<path:filename>')
 def serve_static(filename):
-    # Set correct MIME types for different file extensions
-    mime_types = {
-        '.js': 'application/javascript',
-        '.css': 'text/css',
-        '.html': 'text/html',
-        '.ico': 'image/x-icon',
-        '.svg': 'image/svg+xml',
-        '.png': 'image/png',
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.gif': 'image/gif',
-        '.woff': 'font/woff',
-        '.woff2': 'font/woff2',
-        '.ttf': 'font/ttf'
-    }
-    
     # Get the file extension
-    _, ext = os.path.splitext(filename)
+    ext = os.path.splitext(filename)[1].lower()
     # Get the corresponding MIME type, default to binary stream if not found
-    mimetype = mime_types.get(ext.lower(), 'application/octet-stream')
+    mimetype = STATIC_MIME_TYPES.get(ext, 'application/octet-stream')
     
     response = send_from_directory(BASE_DIR, filename, mimetype=mimetype)
-    if ext.lower() == '.js':
+    if ext == '.js':
         response.headers['Access-Control-Allow-Origin'] = '*'
     return response
 
@@ -134,23 +182,32 @@ system_database = systems.db"""
             }
         })
 
+# ZstdDecompressor instances aren't thread safe, so each server thread keeps its own
+zstd_local = threading.local()
+
+def get_zstd_decompressor():
+    """Get this thread's zstandard decompressor, creating it on first use."""
+    decompressor = getattr(zstd_local, 'decompressor', None)
+    if decompressor is None:
+        decompressor = zstd_local.decompressor = zstandard.ZstdDecompressor()
+    return decompressor
+
 def decompress_data(data: str) -> str:
     """Decompress data if it was compressed during conversion."""
     if not data.startswith('__compressed__'):
         return data
         
     try:
-        # Extract compression method and compressed data
-        _, method, compressed_hex = data.split('__', 2)
-        compressed = bytes.fromhex(compressed_hex)
+        # Extract compression method and base64 encoded compressed data
+        _, _, method, compressed_b64 = data.split('__', 3)
+        compressed = base64.b64decode(compressed_b64)
         
         if method == 'zlib':
             decompressed = zlib.decompress(compressed)
         elif method == 'zstandard':
             if not ZSTD_AVAILABLE:
                 raise ImportError("zstandard package not installed. Install with: pip install zstandard")
-            dctx = zstandard.ZstdDecompressor()
-            decompressed = dctx.decompress(compressed)
+            decompressed = get_zstd_decompressor().decompress(compressed)
         elif method == 'lz4':
             if not LZ4_AVAILABLE:
                 raise ImportError("lz4 package not installed. Install with: pip install lz4")
@@ -163,38 +220,105 @@ def decompress_data(data: str) -> str:
         app.logger.error(f"Error decompressing data: {str(e)}")
         return data  # Return original data if decompression fails
 
-# Modify the row_factory to handle compressed data
-def dict_factory(cursor, row):
-    d = {}
-    for idx, col in enumerate(cursor.description):
-        value = row[idx]
-        # Commented out full_data handling as it's currently unused
-        # if col[0] == 'full_data' and isinstance(value, str):
-        #     # Decompress if necessary
-        #     value = decompress_data(value)
-        #     # Parse JSON after decompression
-        #     try:
-        #         value = json.loads(value)
-        #     except json.JSONDecodeError:
-        #         app.logger.error(f"Error decoding JSON after decompression")
-        #         value = None
-        d[col[0]] = value
-    return d
+# Idle database connections shared by all database files, reused across requests.
+# Entries are (resolved path, file signature, connection), most recently returned last.
+DB_POOL_SIZE = 8
+db_pool = []
+db_pool_lock = threading.Lock()
+
+def get_db_signature(db_path: str) -> tuple:
+    """Identify the current database file, so connections to a replaced file aren't reused."""
+    st = os.stat(db_path)
+    return (st.st_dev, st.st_ino, st.st_mtime)
+
+def open_db_connection(db_path: str) -> sqlite3.Connection:
+    """Open a new database connection configured for read-heavy searches."""
+    # Autocommit so a pooled connection never keeps a read transaction open
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+    # sqlite3.Row is implemented in C and avoids building a dict for every row
+    conn.row_factory = sqlite3.Row
+    # Read through a memory map with a larger page cache, and keep temp tables in memory
+    conn.execute('PRAGMA mmap_size = 268435456')
+    conn.execute('PRAGMA cache_size = -65536')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
 
 def get_db_connection():
-    """Create a database connection with decompression support."""
+    """Get a pooled database connection, returned to the pool when the request ends."""
     db_file = request.args.get('database', 'systems.db')
     # Ensure the database file exists
     if not os.path.exists(db_file):
         app.logger.error(f"Database file not found: {db_file}")
         return None
-    conn = sqlite3.connect(db_file)
-    conn.row_factory = dict_factory
-    return conn
+    if 'db_conn' not in g:
+        # Different spellings of the same file share one set of connections
+        db_path = os.path.realpath(db_file)
+        signature = get_db_signature(db_path)
+        conn = None
+        stale = []
+        with db_pool_lock:
+            for idx in range(len(db_pool) - 1, -1, -1):
+                pooled_path, pooled_signature, pooled_conn = db_pool[idx]
+                if pooled_path != db_path:
+                    continue
+                del db_pool[idx]
+                if pooled_signature == signature:
+                    conn = pooled_conn
+                    break
+                # The file was rebuilt or replaced since this connection was opened
+                stale.append(pooled_conn)
+        for stale_conn in stale:
+            stale_conn.close()
+        if conn is None:
+            conn = open_db_connection(db_path)
+        g.db_conn = conn
+        g.db_pool_entry = (db_path, signature)
+    return g.db_conn
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    """Return the request's database connection to the pool."""
+    conn = g.pop('db_conn', None)
+    if conn is None:
+        return
+    db_path, signature = g.pop('db_pool_entry')
+    evicted = None
+    with db_pool_lock:
+        # Keep the pool bounded across all files by dropping the least recently used connection
+        if len(db_pool) >= DB_POOL_SIZE:
+            evicted = db_pool.pop(0)[2]
+        db_pool.append((db_path, signature, conn))
+    if evicted is not None:
+        evicted.close()
 
 def calculate_distance(x1: float, y1: float, z1: float, x2: float, y2: float, z2: float) -> float:
     """Calculate distance between two points in 3D space."""
-    return math.sqrt((x2-x1)**2 + (y2-y1)**2 + (z2-z1)**2)
+    return math.hypot(x2-x1, y2-y1, z2-z1)
+
+def has_systems_rtree(conn: sqlite3.Connection) -> bool:
+    """Check if the database has the R*Tree index on system coordinates."""
+    cursor = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'systems_rtree'")
+    return cursor.fetchone() is not None
+
+def get_bounding_box_condition(ref_x: float, ref_y: float, ref_z: float, max_distance: float,
+                               use_rtree: bool = False) -> tuple[str, list]:
+    """Get SQL conditions limiting systems to the cube around the reference system."""
+    if use_rtree:
+        # R*Tree boxes are rounded outwards, so an overlap test never drops a system
+        condition = '''s.id64 IN (
+                    SELECT id64 FROM systems_rtree
+                    WHERE max_x >= ? AND min_x <= ?
+                    AND max_y >= ? AND min_y <= ?
+                    AND max_z >= ? AND min_z <= ?
+                )'''
+    else:
+        condition = 's.x BETWEEN ? AND ? AND s.y BETWEEN ? AND ? AND s.z BETWEEN ? AND ?'
+    params = [
+        ref_x - max_distance, ref_x + max_distance,
+        ref_y - max_distance, ref_y + max_distance,
+        ref_z - max_distance, ref_z + max_distance
+    ]
+    return condition, params
 
 def get_ring_materials():
     """Load ring materials and their associated ring types."""
@@ -214,6 +338,113 @@ def get_ring_materials():
         app.logger.error(f"Error loading ring materials: {str(e)}")
     return ring_materials
 
+def assemble_systems(rows, signal_type: str, is_ring_material: bool, ring_type_filter: str,
+                     limit: int) -> List[Dict]:
+    """Group search rows into per-system results with their rings, signals and stations."""
+    processed_results = []
+    current_system = None
+    
+    for row in rows:
+        if current_system is None or current_system['name'] != row['system_name']:
+            if current_system is not None:
+                processed_results.append(current_system)
+                # Rows are only needed until the result limit is reached
+                if len(processed_results) >= limit:
+                    current_system = None
+                    break
+            
+            current_system = {
+                'name': row['system_name'],
+                'controlling_power': row['controlling_power'],
+                'power_state': row['power_state'],
+                'distance': math.sqrt(row['distance_squared']),
+                'system_id64': row['system_id64'],
+                'rings': [],
+                'stations': [],
+                'all_signals': []
+            }
+            # Keys of entries already added, so duplicates are skipped without scanning the lists
+            seen_rings = set()
+            seen_signals = set()
+            stations_by_name = {}
+        
+        # Add ring if not already present
+        if is_ring_material:
+            ring_entry = {
+                'name': row['ring_name'],
+                'body_name': row['body_name'],
+                'signals': f"{signal_type} ({row['ring_type']}, {row['reserve_level']})"
+            }
+            ring_key = tuple(ring_entry.values())
+            if ring_key not in seen_rings:
+                seen_rings.add(ring_key)
+                current_system['rings'].append(ring_entry)
+        else:
+            if ring_type_filter == 'Without Hotspots':
+                # For Without Hotspots, just show the ring type and reserve level
+                ring_entry = {
+                    'name': row['ring_name'],
+                    'body_name': row['body_name'],
+                    'signals': f"{signal_type} ({row['ring_type']}, {row['reserve_level']})"
+                }
+                ring_key = tuple(ring_entry.values())
+                if ring_key not in seen_rings:
+                    seen_rings.add(ring_key)
+                    current_system['rings'].append(ring_entry)
+            else:
+                # For other filters, show hotspot signals
+                if row['mineral_type'] == signal_type:
+                    ring_entry = {
+                        'name': row['ring_name'],
+                        'body_name': row['body_name'],
+                        'signals': f"{signal_type}: {row['signal_count'] or ''} ({row['reserve_level']})"
+                    }
+                    ring_key = tuple(ring_entry.values())
+                    if ring_key not in seen_rings:
+                        seen_rings.add(ring_key)
+                        current_system['rings'].append(ring_entry)
+            
+        # Add to all_signals if not already present
+        signal_entry = {
+            'ring_name': row['ring_name'],
+            'mineral_type': row['mineral_type'],
+            'signal_count': row['signal_count'] or '',
+            'reserve_level': row['reserve_level'],
+            'ring_type': row['ring_type']
+        }
+        signal_key = tuple(signal_entry.values())
+        if signal_key not in seen_signals and signal_entry['mineral_type'] is not None:
+            seen_signals.add(signal_key)
+            current_system['all_signals'].append(signal_entry)
+        
+        # Add station if present and not already added
+        if row['station_name']:
+            try:
+                # Create the station entry unless it was already added
+                if row['station_name'] not in stations_by_name:
+                    # Create new station entry
+                    station_entry = {
+                        'name': row['station_name'],
+                        'pad_size': row['landing_pad_size'],
+                        'distance': float(row['station_distance']) if row['station_distance'] else 0,
+                        'demand': int(row['demand']) if row['demand'] else 0,
+                        'sell_price': int(row['sell_price']) if row['sell_price'] else 0,
+                        'station_type': row['station_type'],
+                        'update_time': row['update_time'],
+                        'system_id64': row['system_id64'],
+                        'other_commodities': []  # Filled in once the kept stations are known
+                    }
+                    current_system['stations'].append(station_entry)
+                    stations_by_name[row['station_name']] = station_entry
+            except (TypeError, ValueError) as e:
+                app.logger.error(f"Error processing station data: {str(e)}")
+                continue
+    
+    if current_system is not None:
+        processed_results.append(current_system)
+    
+    return processed_results[:limit]
+
 @app.route('/')
 def index():
     """Render the main page."""
@@ -241,7 +472,6 @@ def autocomplete():
         results = [{'name': row['name'], 'coords': {'x': row['x'], 'y': row['y'], 'z': row['z']}} 
                   for row in cursor.fetchall()]
         
-        conn.close()
         return jsonify(results)
     except Exception as e:
         app.logger.error(f"Autocomplete error: {str(e)}")
@@ -283,11 +513,14 @@ def search():
         cursor.execute('SELECT x, y, z FROM systems WHERE name = ?', (ref_system,))
         ref_coords = cursor.fetchone()
         if not ref_coords:
-            conn.close()
             return jsonify({'error': 'Reference system not found'}), 404
         
         ref_x, ref_y, ref_z = ref_coords['x'], ref_coords['y'], ref_coords['z']
         
+        # Cheap bounding box prefilter so SQLite can use the R*Tree or coordinate index
+        bbox_condition, bbox_params = get_bounding_box_condition(ref_x, ref_y, ref_z, max_distance,
+                                                                 has_systems_rtree(conn))
+        
         # Get mining type conditions if specified
         mining_type_condition = ''
         mining_type_params = []
@@ -356,11 +589,12 @@ def search():
             query = '''
             WITH relevant_systems AS (
                 SELECT s.*, 
-                    sqrt(((s.x - ?) * (s.x - ?)) + 
-                            ((s.y - ?) * (s.y - ?)) + 
-                            ((s.z - ?) * (s.z - ?))) as distance
+                    (((s.x - ?) * (s.x - ?)) + 
+                     ((s.y - ?) * (s.y - ?)) + 
+                     ((s.z - ?) * (s.z - ?))) as distance_squared
                 FROM systems s
-                WHERE (((s.x - ?) * (s.x - ?)) + 
+                WHERE ''' + bbox_condition + '''
+                AND (((s.x - ?) * (s.x - ?)) + 
                     ((s.y - ?) * (s.y - ?)) + 
                     ((s.z - ?) * (s.z - ?))) <= ? * ?
             ),
@@ -377,7 +611,7 @@ def search():
                 s.id64 as system_id64,
                 s.controlling_power,
                 s.power_state,
-                s.distance,
+                s.distance_squared,
                 ms.body_name,
                 ms.ring_name,
                 ms.ring_type,
@@ -400,7 +634,8 @@ def search():
             '''
             
             params = [
-                ref_x, ref_x, ref_y, ref_y, ref_z, ref_z,  # for distance
+                ref_x, ref_x, ref_y, ref_y, ref_z, ref_z,  # for distance_squared
+                *bbox_params,  # for bounding box
                 ref_x, ref_x, ref_y, ref_y, ref_z, ref_z, max_distance, max_distance,  # for WHERE clause
                 signal_type, signal_type  # for commodity_name and LTD check
             ]
@@ -422,12 +657,10 @@ def search():
                 SELECT s.*, 
                        (((s.x - ?) * (s.x - ?)) + 
                         ((s.y - ?) * (s.y - ?)) + 
-                        ((s.z - ?) * (s.z - ?))) as distance_squared,
-                       sqrt(((s.x - ?) * (s.x - ?)) + 
-                            ((s.y - ?) * (s.y - ?)) + 
-                            ((s.z - ?) * (s.z - ?))) as distance
+                        ((s.z - ?) * (s.z - ?))) as distance_squared
                 FROM systems s
-                WHERE (((s.x - ?) * (s.x - ?)) + 
+                WHERE ''' + bbox_condition + '''
+                AND (((s.x - ?) * (s.x - ?)) + 
                       ((s.y - ?) * (s.y - ?)) + 
                       ((s.z - ?) * (s.z - ?))) <= ? * ?
             ),
@@ -437,7 +670,7 @@ def search():
                     s.name as system_name,
                     s.controlling_power,
                     s.power_state,
-                    s.distance,
+                    s.distance_squared,
                     ms.body_name,
                     ms.ring_name,
                     ms.ring_type,
@@ -459,7 +692,7 @@ def search():
                 rs.system_name,
                 rs.controlling_power,
                 rs.power_state,
-                rs.distance,
+                rs.distance_squared,
                 rs.body_name,
                 rs.ring_name,
                 rs.ring_type,
@@ -479,7 +712,7 @@ def search():
             
             params = [
                 ref_x, ref_x, ref_y, ref_y, ref_z, ref_z,  # for distance_squared
-                ref_x, ref_x, ref_y, ref_y, ref_z, ref_z,  # for distance
+                *bbox_params,  # for bounding box
                 ref_x, ref_x, ref_y, ref_y, ref_z, ref_z, max_distance, max_distance,  # for WHERE clause
                 signal_type,  # for relevant_stations
                 signal_type   # for mineral_signals
@@ -497,11 +730,12 @@ def search():
             query = '''
             WITH relevant_systems AS (
                 SELECT s.*, 
-                    sqrt(((s.x - ?) * (s.x - ?)) + 
-                            ((s.y - ?) * (s.y - ?)) + 
-                            ((s.z - ?) * (s.z - ?))) as distance
+                    (((s.x - ?) * (s.x - ?)) + 
+                     ((s.y - ?) * (s.y - ?)) + 
+                     ((s.z - ?) * (s.z - ?))) as distance_squared
                 FROM systems s
-                WHERE (((s.x - ?) * (s.x - ?)) + 
+                WHERE ''' + bbox_condition + '''
+                AND (((s.x - ?) * (s.x - ?)) + 
                     ((s.y - ?) * (s.y - ?)) + 
                     ((s.z - ?) * (s.z - ?))) <= ? * ?
             ),
@@ -518,7 +752,7 @@ def search():
                 s.id64 as system_id64,
                 s.controlling_power,
                 s.power_state,
-                s.distance,
+                s.distance_squared,
                 ms.body_name,
                 ms.ring_name,
                 ms.ring_type,
@@ -542,7 +776,8 @@ def search():
             '''
             
             params = [
-                ref_x, ref_x, ref_y, ref_y, ref_z, ref_z,  # for distance
+                ref_x, ref_x, ref_y, ref_y, ref_z, ref_z,  # for distance_squared
+                *bbox_params,  # for bounding box
                 ref_x, ref_x, ref_y, ref_y, ref_z, ref_z, max_distance, max_distance,  # for WHERE clause
                 signal_type, signal_type  # for commodity_name and LTD check
             ]
@@ -575,27 +810,34 @@ def search():
                     ELSE 6
                 END,
                 rs.sell_price DESC NULLS LAST,
-                s.distance ASC'''
+                s.distance_squared ASC'''
         else:
-            query += ' ORDER BY rs.sell_price DESC NULLS LAST, s.distance ASC'
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+            query += ' ORDER BY rs.sell_price DESC NULLS LAST, s.distance_squared ASC'
         
-        # Process results
-        processed_results = []
-        current_system = None
+        # Group rows straight from the cursor, so rows past the result limit are never read
+        rows = conn.execute(query, params)
+        processed_results = assemble_systems(rows, signal_type, is_ring_material, ring_type_filter, limit)
+        rows.close()
         
-        # First, collect all system_id64 and station_name pairs
-        station_pairs = [(row['system_id64'], row['station_name']) 
-                        for row in rows if row['station_name']]
+        # Then collect the system_id64 and station_name pairs of the stations being returned
+        station_pairs = [(station['system_id64'], station['name'])
+                        for system in processed_results for station in system['stations']]
         
         # Get all other commodities in a single query
         other_commodities = {}
         if station_pairs:
             other_cursor = conn.cursor()
-            placeholders = ','.join(['(?,?)' for _ in station_pairs])
-            params = [item for pair in station_pairs for item in pair]
+            
+            # Load the pairs into a temp table to join against instead of a (?,?) placeholder per pair
+            other_cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS station_pairs (
+                    system_id64 INTEGER,
+                    station_name TEXT,
+                    PRIMARY KEY (system_id64, station_name)
+                )
+            ''')
+            other_cursor.execute('DELETE FROM station_pairs')
+            other_cursor.executemany('INSERT OR IGNORE INTO station_pairs VALUES (?, ?)', station_pairs)
             
             # Get the selected materials from the request
             selected_materials = request.args.getlist('selected_materials[]', type=str)
@@ -609,11 +851,12 @@ def search():
                     SELECT sc.system_id64, sc.station_name, sc.commodity_name, sc.sell_price, sc.demand,
                            COUNT(*) OVER (PARTITION BY sc.system_id64, sc.station_name) as total_commodities
                     FROM station_commodities sc
-                    WHERE (sc.system_id64, sc.station_name) IN ({placeholders})
-                    AND sc.commodity_name IN ({','.join('?' for _ in full_names)})
+                    JOIN station_pairs p ON sc.system_id64 = p.system_id64
+                        AND sc.station_name = p.station_name
+                    WHERE sc.commodity_name IN ({','.join('?' for _ in full_names)})
                     AND sc.sell_price > 0 AND sc.demand > 0
                     ORDER BY sc.system_id64, sc.station_name, sc.sell_price DESC
-                ''', params + full_names)
+                ''', full_names)
                 
                 # Process results - store all materials for each station
                 for row in other_cursor.fetchall():
@@ -632,13 +875,14 @@ def search():
                         app.logger.info(f"Station {row['station_name']} has {row['total_commodities']} selected commodities")
             else:
                 # Default behavior - just get top 6 by price
-                other_cursor.execute(f'''
-                    SELECT system_id64, station_name, commodity_name, sell_price, demand
-                    FROM station_commodities
-                    WHERE (system_id64, station_name) IN ({placeholders})
-                    AND sell_price > 0 AND demand > 0
-                    ORDER BY sell_price DESC
-                ''', params)
+                other_cursor.execute('''
+                    SELECT sc.system_id64, sc.station_name, sc.commodity_name, sc.sell_price, sc.demand
+                    FROM station_commodities sc
+                    JOIN station_pairs p ON sc.system_id64 = p.system_id64
+                        AND sc.station_name = p.station_name
+                    WHERE sc.sell_price > 0 AND sc.demand > 0
+                    ORDER BY sc.sell_price DESC
+                ''')
                 
                 for row in other_cursor.fetchall():
                     key = (row['system_id64'], row['station_name'])
@@ -653,94 +897,9 @@ def search():
             
             other_cursor.close()
         
-        for row in rows:
-            if current_system is None or current_system['name'] != row['system_name']:
-                if current_system is not None:
-                    processed_results.append(current_system)
-                
-                current_system = {
-                    'name': row['system_name'],
-                    'controlling_power': row['controlling_power'],
-                    'power_state': row['power_state'],
-                    'distance': float(row['distance']),
-                    'system_id64': row['system_id64'],
-                    'rings': [],
-                    'stations': [],
-                    'all_signals': []
-                }
-            
-            # Add ring if not already present
-            if is_ring_material:
-                ring_entry = {
-                    'name': row['ring_name'],
-                    'body_name': row['body_name'],
-                    'signals': f"{signal_type} ({row['ring_type']}, {row['reserve_level']})"
-                }
-                if ring_entry not in current_system['rings']:
-                    current_system['rings'].append(ring_entry)
-            else:
-                if ring_type_filter == 'Without Hotspots':
-                    # For Without Hotspots, just show the ring type and reserve level
-                    ring_entry = {
-                        'name': row['ring_name'],
-                        'body_name': row['body_name'],
-                        'signals': f"{signal_type} ({row['ring_type']}, {row['reserve_level']})"
-                    }
-                    if ring_entry not in current_system['rings']:
-                        current_system['rings'].append(ring_entry)
-                else:
-                    # For other filters, show hotspot signals
-                    if row['mineral_type'] == signal_type:
-                        ring_entry = {
-                            'name': row['ring_name'],
-                            'body_name': row['body_name'],
-                            'signals': f"{signal_type}: {row['signal_count'] or ''} ({row['reserve_level']})"
-                        }
-                        if ring_entry not in current_system['rings']:
-                            current_system['rings'].append(ring_entry)
-                
-            # Add to all_signals if not already present
-            signal_entry = {
-                'ring_name': row['ring_name'],
-                'mineral_type': row['mineral_type'],
-                'signal_count': row['signal_count'] or '',
-                'reserve_level': row['reserve_level'],
-                'ring_type': row['ring_type']
-            }
-            if signal_entry not in current_system['all_signals'] and signal_entry['mineral_type'] is not None:
-                current_system['all_signals'].append(signal_entry)
-            
-            # Add station if present and not already added
-            if row['station_name']:
-                try:
-                    # Get or create station entry
-                    existing_station = next((s for s in current_system['stations'] if s['name'] == row['station_name']), None)
-                    if existing_station:
-                        # Update existing station's commodities
-                        existing_station['other_commodities'] = other_commodities.get((row['system_id64'], row['station_name']), [])
-                    else:
-                        # Create new station entry
-                        station_entry = {
-                            'name': row['station_name'],
-                            'pad_size': row['landing_pad_size'],
-                            'distance': float(row['station_distance']) if row['station_distance'] else 0,
-                            'demand': int(row['demand']) if row['demand'] else 0,
-                            'sell_price': int(row['sell_price']) if row['sell_price'] else 0,
-                            'station_type': row['station_type'],
-                            'update_time': row.get('update_time'),
-                            'system_id64': row['system_id64'],
-                            'other_commodities': other_commodities.get((row['system_id64'], row['station_name']), [])
-                        }
-                        current_system['stations'].append(station_entry)
-                except (TypeError, ValueError) as e:
-                    app.logger.error(f"Error processing station data: {str(e)}")
-                    continue
-        
-        if current_system is not None:
-            processed_results.append(current_system)
-        
-        # Limit results before returning
-        processed_results = processed_results[:limit]
+        for system in processed_results:
+            for station in system['stations']:
+                station['other_commodities'] = other_commodities.get((station['system_id64'], station['name']), [])
         
         # After processing the main results, get all other signals for these systems
         if not is_non_hotspot and processed_results:
@@ -772,7 +931,6 @@ def search():
             for system in processed_results:
                 system['all_signals'].extend(other_signals.get(system['system_id64'], []))
         
-        conn.close()
         return jsonify(processed_results)
         
     except Exception as e:
@@ -882,9 +1040,8 @@ def search_highest():
         
         power_filter_params.append(limit)
         cursor.execute(query, power_filter_params)
-        results = cursor.fetchall()
+        results = [dict(row) for row in cursor.fetchall()]
         
-        conn.close()
         return jsonify(results)
     
     except Exception as e:
@@ -902,6 +1059,7 @@ def get_price_comparison_endpoint():
         if not items:
             return jsonify([])
             
+        price_key = 'max_price' if use_max else 'avg_price'
         results = []
         for item in items:
             price = int(item.get('price', 0))
@@ -922,7 +1080,7 @@ def get_price_comparison_endpoint():
                     results.append({'color': None, 'indicator': ''})
                     continue
             
-            reference_price = int(PRICE_DATA[normalized_commodity]['max_price' if use_max else 'avg_price'])
+            reference_price = PRICE_DATA[normalized_commodity][price_key]
             color, indicator = get_price_comparison(price, reference_price)
             
             results.append({
@@ -948,13 +1106,11 @@ def search_res_hotspots():
             return jsonify({'error': 'Database connection failed'}), 500
             
         cursor = conn.cursor()
-        cursor.row_factory = res_data.dict_factory
         
         # Get reference system coordinates
         cursor.execute('SELECT x, y, z FROM systems WHERE name = ?', (ref_system,))
         ref_coords = cursor.fetchone()
         if not ref_coords:
-            conn.close()
             return jsonify({'error': 'Reference system not found'}), 404
         
         ref_x, ref_y, ref_z = ref_coords['x'], ref_coords['y'], ref_coords['z']
@@ -962,38 +1118,31 @@ def search_res_hotspots():
         # Load RES hotspot data with database path
         hotspot_data = res_data.load_res_data(database)
         
+        # Get system info for all entries in a single query
+        systems = res_data.get_systems_info(conn, [entry['system'] for entry in hotspot_data])
+        
+        # Get station data for all found systems in a single query
+        system_stations = res_data.get_systems_station_commodities(
+            conn, list({system['id64'] for system in systems.values()}))
+        
         # Process each system
         results = []
         for entry in hotspot_data:
-            # Get system info from database
-            cursor.execute('''
-                SELECT s.*, 
-                    sqrt(((s.x - ?) * (s.x - ?)) + 
-                         ((s.y - ?) * (s.y - ?)) + 
-                         ((s.z - ?) * (s.z - ?))) as distance
-                FROM systems s
-                WHERE s.name = ?
-            ''', (ref_x, ref_x, ref_y, ref_y, ref_z, ref_z, entry['system']))
-            
-            system = cursor.fetchone()
+            system = systems.get(entry['system'])
             if not system:
                 continue
                 
-            # Get station data
-            stations = res_data.get_station_commodities(conn, system['id64'])
-            
             results.append({
                 'system': entry['system'],
                 'power': system['controlling_power'] or 'None',
-                'distance': float(system['distance']),
+                'distance': calculate_distance(ref_x, ref_y, ref_z, system['x'], system['y'], system['z']),
                 'ring': entry['ring'],
                 'ls': entry['ls'],
                 'res_zone': entry['res_zone'],
                 'comment': entry['comment'],
-                'stations': stations
+                'stations': system_stations.get(system['id64'], [])
             })
         
-        conn.close()
         return jsonify(results)
     
     except Exception as e:
@@ -1012,13 +1161,11 @@ def search_high_yield_platinum():
             return jsonify({'error': 'Database connection failed'}), 500
             
         cursor = conn.cursor()
-        cursor.row_factory = res_data.dict_factory
         
         # Get reference system coordinates
         cursor.execute('SELECT x, y, z FROM systems WHERE name = ?', (ref_system,))
         ref_coords = cursor.fetchone()
         if not ref_coords:
-            conn.close()
             return jsonify({'error': 'Reference system not found'}), 404
         
         ref_x, ref_y, ref_z = ref_coords['x'], ref_coords['y'], ref_coords['z']
@@ -1026,41 +1173,43 @@ def search_high_yield_platinum():
         # Load high yield platinum data
         data = res_data.load_high_yield_platinum()
         
+        # Get system info for all entries in a single query
+        systems = res_data.get_systems_info(conn, [entry['system'] for entry in data])
+        
+        # Get station data for all found systems in a single query
+        system_stations = res_data.get_systems_station_commodities(
+            conn, list({system['id64'] for system in systems.values()}))
+        
         # Process each system
         results = []
         for entry in data:
-            # Get system info from database
-            cursor.execute('''
-                SELECT s.*, 
-                    sqrt(((s.x - ?) * (s.x - ?)) + 
-                         ((s.y - ?) * (s.y - ?)) + 
-                         ((s.z - ?) * (s.z - ?))) as distance
-                FROM systems s
-                WHERE s.name = ?
-            ''', (ref_x, ref_x, ref_y, ref_y, ref_z, ref_z, entry['system']))
-            
-            system = cursor.fetchone()
+            system = systems.get(entry['system'])
             if not system:
                 continue
                 
-            # Get station data
-            stations = res_data.get_station_commodities(conn, system['id64'])
-            
             results.append({
                 'system': entry['system'],
                 'power': system['controlling_power'] or 'None',
-                'distance': float(system['distance']),
+                'distance': calculate_distance(ref_x, ref_y, ref_z, system['x'], system['y'], system['z']),
                 'ring': entry['ring'],
                 'percentage': entry['percentage'],  # Include the percentage from CSV
                 'comment': entry['comment'],
-                'stations': stations
+                'stations': system_stations.get(system['id64'], [])
             })
         
-        conn.close()
         return jsonify(results)
     except Exception as e:
         app.logger.error(f"High yield platinum search error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Run the mining search web server')
+    parser.add_argument('--debug', action='store_true',
+                      help='Use the Flask development server with debugging and auto reload')
+    args = parser.parse_args()
+    
+    if WAITRESS_AVAILABLE and not args.debug:
+        # One thread per pooled database connection
+        waitress.serve(app, host='127.0.0.1', port=5000, threads=DB_POOL_SIZE)
+    else:
+        app.run(debug=True, port=5000) 
\ No newline at end of file